@@ -3,19 +3,22 @@ from __future__ import annotations
 import os
 import time
 import uuid
+from contextlib import asynccontextmanager
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Dict, Iterable, Optional
+from typing import Annotated, AsyncIterator, Dict, Optional, TypeVar
 
-import json
+import asyncio
 
+import aiohttp
 import httpx
-from fastapi import FastAPI, HTTPException
+import msgspec
+import orjson
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse, StreamingResponse
-from pydantic import BaseModel, Field
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 
-from streaming import StreamingDeps, attach_audio_ws
+from streaming import StreamingDeps, attach_audio_ws, iter_stream_lines, stream_timeout
 
 def load_local_env_file(path: Path) -> None:
     if not path.exists():
@@ -74,7 +77,33 @@ AVATAR_PRESETS_PATH = (
     else Path(__file__).with_name("avatars.json")
 )
 
-app = FastAPI(title="OpenClaw Project Client", version="0.1.0")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    # One pooled client for every upstream call so keep-alive connections are reused.
+    # Streaming paths go through aiohttp; httpx stays for plain and multipart requests.
+    client = httpx.AsyncClient(
+        timeout=httpx.Timeout(OPENCLAW_TIMEOUT_SECONDS),
+        limits=httpx.Limits(max_keepalive_connections=100, max_connections=200),
+    )
+    session = aiohttp.ClientSession(
+        connector=aiohttp.TCPConnector(limit=200, ttl_dns_cache=300),
+        json_serialize=lambda value: orjson.dumps(value).decode(),
+    )
+    app.state.http = client
+    app.state.stream_session = session
+    streaming_deps.http_client = client
+    streaming_deps.stream_session = session
+    try:
+        yield
+    finally:
+        streaming_deps.http_client = None
+        streaming_deps.stream_session = None
+        await session.close()
+        await client.aclose()
+
+
+app = FastAPI(title="OpenClaw Project Client", version="0.1.0", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -103,46 +132,74 @@ class Avatar:
 
 projects: Dict[str, Project] = {}
 _avatar_cache: list[Avatar] = []
+_avatar_cache_by_id: dict[str, Avatar] = {}
 _avatar_cache_at: float = 0.0
+_avatar_cache_lock = asyncio.Lock()
+_avatar_refresh_task: Optional[asyncio.Task] = None
 
 
-class ProjectCreate(BaseModel):
-    name: str = Field(..., min_length=1, max_length=200)
-    avatar_id: Optional[str] = Field(default=None, alias="avatarId")
+class ProjectCreate(msgspec.Struct, rename={"avatar_id": "avatarId"}):
+    name: Annotated[str, msgspec.Meta(min_length=1, max_length=200)]
+    avatar_id: Optional[str] = None
 
 
-class ProjectUpdate(BaseModel):
-    avatar_id: Optional[str] = Field(default=None, alias="avatarId")
+class ProjectUpdate(msgspec.Struct, rename={"avatar_id": "avatarId"}):
+    avatar_id: Optional[str] = None
 
 
-class ProjectView(BaseModel):
+class ProjectView(msgspec.Struct, rename={"avatar_id": "avatarId"}):
     id: str
     name: str
     session_key: str
     created_at: float
-    avatar_id: Optional[str] = Field(default=None, alias="avatarId")
+    avatar_id: Optional[str] = None
 
 
-class AvatarView(BaseModel):
+class AvatarView(msgspec.Struct, rename={"voice_id": "voiceId"}):
     id: str
     name: str
-    voice_id: str = Field(..., alias="voiceId")
+    voice_id: str
 
 
-class ChatRequest(BaseModel):
-    project_id: str = Field(..., alias="projectId")
+class ChatRequest(msgspec.Struct, rename={"project_id": "projectId", "avatar_id": "avatarId"}):
+    project_id: str
     message: str
     instructions: Optional[str] = None
-    avatar_id: Optional[str] = Field(default=None, alias="avatarId")
+    avatar_id: Optional[str] = None
 
 
-class ChatResponse(BaseModel):
+class ChatResponse(msgspec.Struct):
     reply: str
 
 
+PayloadT = TypeVar("PayloadT")
+
+
+async def read_payload(request: Request, model: type[PayloadT]) -> PayloadT:
+    # Decode and validate straight from the raw body with msgspec instead of pydantic.
+    try:
+        return msgspec.json.decode(await request.body(), type=model)
+    except msgspec.DecodeError as exc:
+        raise HTTPException(status_code=422, detail=str(exc)) from exc
+
+
+def msgspec_response(content: object) -> Response:
+    return Response(content=msgspec.json.encode(content), media_type="application/json")
+
+
+_SESSION_KEY_PREFIX = f"agent:{OPENCLAW_AGENT_ID}:proj:"
+
+
 def make_session_key(project_id: str) -> str:
-    cleaned = project_id.strip().lower()
-    return f"agent:{OPENCLAW_AGENT_ID}:proj:{cleaned}"
+    return _SESSION_KEY_PREFIX + project_id.strip().lower()
+
+
+def http_client() -> httpx.AsyncClient:
+    return app.state.http
+
+
+def stream_session() -> aiohttp.ClientSession:
+    return app.state.stream_session
 
 
 def get_project(project_id: str) -> Project:
@@ -171,8 +228,8 @@ def _load_avatar_presets() -> list[Avatar]:
     if not AVATAR_PRESETS_PATH.exists():
         return []
     try:
-        raw = json.loads(AVATAR_PRESETS_PATH.read_text(encoding="utf-8"))
-    except json.JSONDecodeError:
+        raw = orjson.loads(AVATAR_PRESETS_PATH.read_bytes())
+    except orjson.JSONDecodeError:
         return []
     if not isinstance(raw, list):
         return []
@@ -192,10 +249,9 @@ async def _fetch_elevenlabs_voices() -> list[Avatar]:
     url = f"{ELEVENLABS_BASE_URL}/v1/voices"
     timeout = httpx.Timeout(15.0)
     headers = {"xi-api-key": ELEVENLABS_API_KEY}
-    async with httpx.AsyncClient(timeout=timeout) as client:
-        resp = await client.get(url, headers=headers)
+    resp = await http_client().get(url, headers=headers, timeout=timeout)
     resp.raise_for_status()
-    payload = resp.json()
+    payload = orjson.loads(resp.content)
     voices = payload.get("voices", [])
     avatars: list[Avatar] = []
     if isinstance(voices, list):
@@ -210,11 +266,7 @@ async def _fetch_elevenlabs_voices() -> list[Avatar]:
     return avatars
 
 
-async def resolve_avatars() -> list[Avatar]:
-    global _avatar_cache, _avatar_cache_at
-    if _avatar_cache and not _cache_expired():
-        return _avatar_cache
-
+async def _load_avatars() -> list[Avatar]:
     if AVATAR_SOURCE == "file":
         avatars = _load_avatar_presets()
     elif AVATAR_SOURCE == "elevenlabs":
@@ -228,51 +280,81 @@ async def resolve_avatars() -> list[Avatar]:
                 avatars = []
         if not avatars:
             avatars = _load_avatar_presets()
-
-    _avatar_cache = avatars
-    _avatar_cache_at = time.time()
     return avatars
 
 
+async def _refresh_avatar_cache() -> list[Avatar]:
+    global _avatar_cache, _avatar_cache_by_id, _avatar_cache_at
+    # Serialize refetches; callers that queued behind a refresh reuse its result.
+    async with _avatar_cache_lock:
+        if _avatar_cache and not _cache_expired():
+            return _avatar_cache
+        avatars = await _load_avatars()
+        _avatar_cache = avatars
+        # Reversed so the first entry wins when ids repeat, matching list order.
+        _avatar_cache_by_id = {avatar.avatar_id: avatar for avatar in reversed(avatars)}
+        _avatar_cache_at = time.time()
+        return avatars
+
+
+async def _revalidate_avatar_cache() -> None:
+    try:
+        await _refresh_avatar_cache()
+    except httpx.HTTPError:
+        # Keep serving the stale list; the next expired read retries.
+        pass
+
+
+def invalidate_avatar_cache() -> None:
+    global _avatar_cache_at
+    _avatar_cache_at = 0.0
+
+
+async def resolve_avatars() -> list[Avatar]:
+    global _avatar_refresh_task
+    if not _avatar_cache:
+        return await _refresh_avatar_cache()
+    if _cache_expired() and (_avatar_refresh_task is None or _avatar_refresh_task.done()):
+        # Stale-while-revalidate: answer from the cache and refetch in the background.
+        _avatar_refresh_task = asyncio.create_task(_revalidate_avatar_cache())
+    return _avatar_cache
+
+
 async def resolve_avatar(avatar_id: Optional[str]) -> Optional[Avatar]:
     if not avatar_id:
         return None
-    avatars = await resolve_avatars()
-    for avatar in avatars:
-        if avatar.avatar_id == avatar_id:
-            return avatar
-    return None
+    await resolve_avatars()
+    return _avatar_cache_by_id.get(avatar_id)
+
+
+_BASE_HEADERS: Dict[str, str] = {"x-openclaw-agent-id": OPENCLAW_AGENT_ID}
+if OPENCLAW_TOKEN:
+    _BASE_HEADERS["Authorization"] = f"Bearer {OPENCLAW_TOKEN}"
 
 
 def openclaw_headers(session_key: str) -> Dict[str, str]:
-    headers: Dict[str, str] = {
-        "x-openclaw-session-key": session_key,
-        "x-openclaw-agent-id": OPENCLAW_AGENT_ID,
-    }
-    if OPENCLAW_TOKEN:
-        headers["Authorization"] = f"Bearer {OPENCLAW_TOKEN}"
-    return headers
+    return {**_BASE_HEADERS, "x-openclaw-session-key": session_key}
+
+
+_OUTPUT_TEXT_PART_TYPES = frozenset({"output_text", "text"})
 
 
 def extract_output_text(payload: dict) -> str:
-    if isinstance(payload.get("output_text"), str):
-        return payload["output_text"]
+    output_text = payload.get("output_text")
+    if isinstance(output_text, str):
+        return output_text
     output = payload.get("output")
     if not isinstance(output, list):
         return ""
-    chunks: list[str] = []
-    for item in output:
-        if not isinstance(item, dict):
-            continue
-        if item.get("type") == "message":
-            for part in item.get("content", []) or []:
-                if not isinstance(part, dict):
-                    continue
-                if part.get("type") in {"output_text", "text"}:
-                    text = part.get("text")
-                    if isinstance(text, str):
-                        chunks.append(text)
-    return "".join(chunks)
+    return "".join(
+        part["text"]
+        for item in output
+        if isinstance(item, dict) and item.get("type") == "message"
+        for part in item.get("content") or ()
+        if isinstance(part, dict)
+        and part.get("type") in _OUTPUT_TEXT_PART_TYPES
+        and isinstance(part.get("text"), str)
+    )
 
 
 @app.get("/api/health")
@@ -288,42 +370,64 @@ async def health() -> JSONResponse:
     )
 
 
-@app.get("/api/avatars", response_model=list[AvatarView])
-async def list_avatars() -> list[AvatarView]:
+@app.get("/api/avatars")
+async def list_avatars() -> Response:
     avatars = await resolve_avatars()
-    return [
-        AvatarView(id=avatar.avatar_id, name=avatar.name, voiceId=avatar.voice_id)
-        for avatar in avatars
-    ]
+    return msgspec_response(
+        [
+            AvatarView(id=avatar.avatar_id, name=avatar.name, voice_id=avatar.voice_id)
+            for avatar in avatars
+        ]
+    )
 
 
-@app.get("/api/projects", response_model=list[ProjectView])
-async def list_projects() -> list[ProjectView]:
-    return [
-        ProjectView(
-            id=project.project_id,
-            name=project.name,
-            session_key=project.session_key,
-            created_at=project.created_at,
-            avatarId=project.avatar_id,
-        )
-        for project in projects.values()
-    ]
+@app.post("/api/avatars/refresh")
+async def refresh_avatars() -> Response:
+    invalidate_avatar_cache()
+    try:
+        avatars = await _refresh_avatar_cache()
+    except httpx.HTTPError as exc:
+        raise HTTPException(status_code=502, detail=f"Avatar refresh failed: {exc}") from exc
+    return msgspec_response(
+        [
+            AvatarView(id=avatar.avatar_id, name=avatar.name, voice_id=avatar.voice_id)
+            for avatar in avatars
+        ]
+    )
+
 
+@app.get("/api/projects")
+async def list_projects() -> Response:
+    return msgspec_response(
+        [
+            ProjectView(
+                id=project.project_id,
+                name=project.name,
+                session_key=project.session_key,
+                created_at=project.created_at,
+                avatar_id=project.avatar_id,
+            )
+            for project in projects.values()
+        ]
+    )
+
+
+@app.post("/api/projects")
+async def create_project(request: Request) -> Response:
+    payload = await read_payload(request, ProjectCreate)
+    project_id = uuid.uuid4().hex
+    session_key = make_session_key(project_id)
 
-@app.post("/api/projects", response_model=ProjectView)
-async def create_project(payload: ProjectCreate) -> ProjectView:
+    # One cache read covers both validation and the default; the id index is
+    # refreshed together with the list, so no second await is needed.
     avatars = await resolve_avatars()
     avatar_id = payload.avatar_id
     if avatar_id:
-        avatar = await resolve_avatar(avatar_id)
-        if not avatar:
+        if avatar_id not in _avatar_cache_by_id:
             raise HTTPException(status_code=400, detail="Unknown avatarId")
     elif avatars:
         avatar_id = avatars[0].avatar_id
 
-    project_id = uuid.uuid4().hex
-    session_key = make_session_key(project_id)
     project = Project(
         project_id=project_id,
         name=payload.name.strip(),
@@ -332,40 +436,42 @@ async def create_project(payload: ProjectCreate) -> ProjectView:
         avatar_id=avatar_id,
     )
     projects[project_id] = project
-    return ProjectView(
-        id=project.project_id,
-        name=project.name,
-        session_key=project.session_key,
-        created_at=project.created_at,
-        avatarId=project.avatar_id,
+    return msgspec_response(
+        ProjectView(
+            id=project.project_id,
+            name=project.name,
+            session_key=project.session_key,
+            created_at=project.created_at,
+            avatar_id=project.avatar_id,
+        )
     )
 
 
-@app.patch("/api/projects/{project_id}", response_model=ProjectView)
-async def update_project(project_id: str, payload: ProjectUpdate) -> ProjectView:
+@app.patch("/api/projects/{project_id}")
+async def update_project(project_id: str, request: Request) -> Response:
+    payload = await read_payload(request, ProjectUpdate)
     project = get_project(project_id)
     if payload.avatar_id is not None:
         avatar = await resolve_avatar(payload.avatar_id)
         if not avatar:
             raise HTTPException(status_code=400, detail="Unknown avatarId")
         project.avatar_id = avatar.avatar_id
-    return ProjectView(
-        id=project.project_id,
-        name=project.name,
-        session_key=project.session_key,
-        created_at=project.created_at,
-        avatarId=project.avatar_id,
+    return msgspec_response(
+        ProjectView(
+            id=project.project_id,
+            name=project.name,
+            session_key=project.session_key,
+            created_at=project.created_at,
+            avatar_id=project.avatar_id,
+        )
     )
 
 
-@app.post("/api/chat", response_model=ChatResponse)
-async def chat(payload: ChatRequest) -> ChatResponse:
+@app.post("/api/chat")
+async def chat(request: Request) -> Response:
+    payload = await read_payload(request, ChatRequest)
+    # The avatar only drives voice output; it is changed via PATCH /api/projects, not per chat.
     project = get_project(payload.project_id)
-    if payload.avatar_id and payload.avatar_id != project.avatar_id:
-        avatar = await resolve_avatar(payload.avatar_id)
-        if not avatar:
-            raise HTTPException(status_code=400, detail="Unknown avatarId")
-        project.avatar_id = avatar.avatar_id
     request_payload: dict = {
         "model": OPENCLAW_MODEL,
         "input": payload.message,
@@ -376,61 +482,61 @@ async def chat(payload: ChatRequest) -> ChatResponse:
     url = f"{OPENCLAW_BASE_URL}/v1/responses"
     headers = openclaw_headers(project.session_key)
 
-    timeout = httpx.Timeout(OPENCLAW_TIMEOUT_SECONDS)
-    async with httpx.AsyncClient(timeout=timeout) as client:
-        try:
-            resp = await client.post(url, headers=headers, json=request_payload)
-            resp.raise_for_status()
-        except httpx.HTTPError as exc:
-            raise HTTPException(status_code=502, detail=f"OpenClaw request failed: {exc}") from exc
+    try:
+        resp = await http_client().post(url, headers=headers, json=request_payload)
+        resp.raise_for_status()
+    except httpx.HTTPError as exc:
+        raise HTTPException(status_code=502, detail=f"OpenClaw request failed: {exc}") from exc
 
-    data = resp.json()
+    data = orjson.loads(resp.content)
     reply = extract_output_text(data)
-    return ChatResponse(reply=reply)
+    return msgspec_response(ChatResponse(reply=reply))
 
 
 async def stream_openclaw_events(
     url: str,
     headers: Dict[str, str],
     payload: dict,
-) -> Iterable[str]:
-    async def emit_error(message: str, status_code: int | None = None) -> Iterable[str]:
+) -> AsyncIterator[bytes]:
+    async def emit_error(message: str, status_code: int | None = None) -> AsyncIterator[bytes]:
         error_payload: dict = {"type": "response.error", "error": message}
         if status_code is not None:
             error_payload["status"] = status_code
-        yield f"data: {json.dumps(error_payload, ensure_ascii=True)}\n\n"
-        yield "data: [DONE]\n\n"
+        yield b"data: " + orjson.dumps(error_payload) + b"\n\n"
+        yield b"data: [DONE]\n\n"
 
-    timeout = httpx.Timeout(OPENCLAW_TIMEOUT_SECONDS, read=None)
+    timeout = stream_timeout(OPENCLAW_TIMEOUT_SECONDS)
     try:
-        async with httpx.AsyncClient(timeout=timeout) as client:
-            async with client.stream("POST", url, headers=headers, json=payload) as resp:
-                if resp.status_code >= 400:
-                    raw = (await resp.aread()).decode("utf-8", errors="replace").strip()
-                    message = raw or f"OpenClaw stream request failed with status {resp.status_code}"
-                    async for chunk in emit_error(message, resp.status_code):
-                        yield chunk
-                    return
-                async for line in resp.aiter_lines():
-                    if not line:
-                        continue
-                    if line.startswith("data:"):
-                        yield f"{line}\n\n"
-                    else:
-                        yield f"data: {line}\n\n"
-    except httpx.HTTPError as exc:
+        async with stream_session().post(
+            url, headers=headers, json=payload, timeout=timeout
+        ) as resp:
+            if resp.status >= 400:
+                raw = (await resp.read()).decode("utf-8", errors="replace").strip()
+                message = raw or f"OpenClaw stream request failed with status {resp.status}"
+                async for chunk in emit_error(message, resp.status):
+                    yield chunk
+                return
+            if resp.content_type == "text/event-stream":
+                # Already SSE-framed upstream: relay the bytes untouched.
+                async for chunk in resp.content.iter_chunked(16384):
+                    yield chunk
+                return
+            async for line in iter_stream_lines(resp.content):
+                if not line:
+                    continue
+                if line.startswith(b"data:"):
+                    yield line + b"\n\n"
+                else:
+                    yield b"data: " + line + b"\n\n"
+    except (aiohttp.ClientError, asyncio.TimeoutError) as exc:
         async for chunk in emit_error(f"OpenClaw stream request failed: {exc}"):
             yield chunk
 
 
 @app.post("/api/chat/stream")
-async def chat_stream(payload: ChatRequest) -> StreamingResponse:
+async def chat_stream(request: Request) -> StreamingResponse:
+    payload = await read_payload(request, ChatRequest)
     project = get_project(payload.project_id)
-    if payload.avatar_id and payload.avatar_id != project.avatar_id:
-        avatar = await resolve_avatar(payload.avatar_id)
-        if not avatar:
-            raise HTTPException(status_code=400, detail="Unknown avatarId")
-        project.avatar_id = avatar.avatar_id
     request_payload: dict = {
         "model": OPENCLAW_MODEL,
         "input": payload.message,
@@ -449,25 +555,23 @@ async def chat_stream(payload: ChatRequest) -> StreamingResponse:
     )
 
 
-attach_audio_ws(
-    app,
-    StreamingDeps(
-        openclaw_base_url=OPENCLAW_BASE_URL,
-        openclaw_model=OPENCLAW_MODEL,
-        openclaw_timeout_seconds=OPENCLAW_TIMEOUT_SECONDS,
-        openclaw_headers=openclaw_headers,
-        get_project=get_project,
-        resolve_avatar=resolve_avatar,
-        elevenlabs_api_key=ELEVENLABS_API_KEY,
-        elevenlabs_base_url=ELEVENLABS_BASE_URL,
-        elevenlabs_model_id=ELEVENLABS_MODEL_ID,
-        elevenlabs_output_format=ELEVENLABS_OUTPUT_FORMAT,
-        elevenlabs_optimize_latency=ELEVENLABS_OPTIMIZE_LATENCY,
-        elevenlabs_default_voice_id=ELEVENLABS_DEFAULT_VOICE_ID,
-        whisper_http_url=WHISPER_HTTP_URL,
-        whisper_http_api_key=WHISPER_HTTP_API_KEY,
-        whisper_cmd=WHISPER_CMD,
-        whisper_model=WHISPER_MODEL,
-        whisper_language=WHISPER_LANGUAGE,
-    ),
+streaming_deps = StreamingDeps(
+    openclaw_base_url=OPENCLAW_BASE_URL,
+    openclaw_model=OPENCLAW_MODEL,
+    openclaw_timeout_seconds=OPENCLAW_TIMEOUT_SECONDS,
+    openclaw_headers=openclaw_headers,
+    get_project=get_project,
+    resolve_avatar=resolve_avatar,
+    elevenlabs_api_key=ELEVENLABS_API_KEY,
+    elevenlabs_base_url=ELEVENLABS_BASE_URL,
+    elevenlabs_model_id=ELEVENLABS_MODEL_ID,
+    elevenlabs_output_format=ELEVENLABS_OUTPUT_FORMAT,
+    elevenlabs_optimize_latency=ELEVENLABS_OPTIMIZE_LATENCY,
+    elevenlabs_default_voice_id=ELEVENLABS_DEFAULT_VOICE_ID,
+    whisper_http_url=WHISPER_HTTP_URL,
+    whisper_http_api_key=WHISPER_HTTP_API_KEY,
+    whisper_cmd=WHISPER_CMD,
+    whisper_model=WHISPER_MODEL,
+    whisper_language=WHISPER_LANGUAGE,
 )
+attach_audio_ws(app, streaming_deps)
@@ -1,17 +1,17 @@
 from __future__ import annotations
 
 import asyncio
-import base64
-import json
 import os
 import shutil
-import subprocess
+import struct
 import tempfile
-import wave
 from dataclasses import dataclass, field
-from typing import Any, Callable, Optional
+from typing import Any, AsyncIterator, Callable, Optional
 
+import aiohttp
 import httpx
+import numpy as np
+import orjson
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect
 from starlette.websockets import WebSocketState
 
@@ -35,6 +35,38 @@ class StreamingDeps:
     whisper_cmd: str
     whisper_model: str
     whisper_language: str
+    # Shared pooled clients, owned by the app lifespan.
+    http_client: Optional[httpx.AsyncClient] = None
+    stream_session: Optional[aiohttp.ClientSession] = None
+    # TTS request pieces that only depend on configuration, built once in __post_init__.
+    tts_headers: dict = field(init=False, repr=False)
+    tts_params: dict = field(init=False, repr=False)
+    tts_is_pcm: bool = field(init=False)
+    tts_sample_rate: int = field(init=False)
+
+    def __post_init__(self) -> None:
+        self.tts_is_pcm = self.elevenlabs_output_format.startswith("pcm_")
+        self.tts_sample_rate = resolve_pcm_sample_rate(self.elevenlabs_output_format)
+        self.tts_headers = {
+            "xi-api-key": self.elevenlabs_api_key,
+            "Content-Type": "application/json",
+            "Accept": "audio/pcm" if self.tts_is_pcm else "audio/mpeg",
+        }
+        self.tts_params = {}
+        if self.elevenlabs_optimize_latency:
+            self.tts_params["optimize_streaming_latency"] = self.elevenlabs_optimize_latency
+
+    @property
+    def http(self) -> httpx.AsyncClient:
+        if self.http_client is None:
+            raise RuntimeError("HTTP client not initialized")
+        return self.http_client
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        if self.stream_session is None:
+            raise RuntimeError("Streaming session not initialized")
+        return self.stream_session
 
 
 @dataclass
@@ -64,7 +96,35 @@ class AudioStreamState:
 async def send_ws_event(ws: WebSocket, payload: dict) -> None:
     if ws.client_state != WebSocketState.CONNECTED:
         return
-    await ws.send_text(json.dumps(payload, ensure_ascii=True))
+    # Text frames keep JSON events distinguishable from binary frames on the client.
+    await ws.send_text(orjson.dumps(payload).decode())
+
+
+async def send_ws_bytes(ws: WebSocket, data: bytes) -> None:
+    if ws.client_state != WebSocketState.CONNECTED:
+        return
+    await ws.send_bytes(data)
+
+
+def stream_timeout(connect_seconds: float) -> aiohttp.ClientTimeout:
+    # Bound connection setup only; streamed bodies may stay open as long as upstream talks.
+    return aiohttp.ClientTimeout(total=None, connect=connect_seconds)
+
+
+async def iter_stream_lines(content: aiohttp.StreamReader) -> AsyncIterator[bytes]:
+    # Split raw bytes on newlines; callers decode only what they actually use.
+    buffer = bytearray()
+    async for chunk in content.iter_chunked(65536):
+        buffer += chunk
+        start = 0
+        end = buffer.find(b"\n")
+        while end != -1:
+            yield bytes(buffer[start:end]).rstrip(b"\r")
+            start = end + 1
+            end = buffer.find(b"\n", start)
+        del buffer[:start]
+    if buffer:
+        yield bytes(buffer).rstrip(b"\r")
 
 
 def resolve_pcm_sample_rate(format_name: str) -> int:
@@ -76,21 +136,41 @@ def resolve_pcm_sample_rate(format_name: str) -> int:
     return 16000
 
 
-async def write_wav_to_temp(pcm_bytes: bytes, sample_rate: int, channels: int) -> str:
+def wav_header(n_bytes: int, sample_rate: int, channels: int) -> bytes:
+    # Canonical 44-byte RIFF header for 16-bit PCM.
+    return struct.pack(
+        "<4sI4s4sIHHIIHH4sI",
+        b"RIFF",
+        36 + n_bytes,
+        b"WAVE",
+        b"fmt ",
+        16,
+        1,
+        channels,
+        sample_rate,
+        sample_rate * channels * 2,
+        channels * 2,
+        16,
+        b"data",
+        n_bytes,
+    )
+
+
+def build_wav_bytes(pcm_bytes: bytes | memoryview, sample_rate: int, channels: int) -> bytes:
+    return wav_header(len(pcm_bytes), sample_rate, channels) + pcm_bytes
+
+
+async def write_wav_to_temp(pcm_bytes: bytes | memoryview, sample_rate: int, channels: int) -> str:
     def _write() -> str:
-        tmp = tempfile.NamedTemporaryFile(delete=False, suffix=".wav")
-        tmp.close()
-        with wave.open(tmp.name, "wb") as wav:
-            wav.setnchannels(channels)
-            wav.setsampwidth(2)
-            wav.setframerate(sample_rate)
-            wav.writeframes(pcm_bytes)
+        with tempfile.NamedTemporaryFile(delete=False, suffix=".wav") as tmp:
+            tmp.write(wav_header(len(pcm_bytes), sample_rate, channels))
+            tmp.write(pcm_bytes)
         return tmp.name
 
     return await asyncio.to_thread(_write)
 
 
-async def transcribe_with_http(deps: StreamingDeps, audio_path: str, language: Optional[str]) -> str:
+async def transcribe_with_http(deps: StreamingDeps, wav_bytes: bytes, language: Optional[str]) -> str:
     if not deps.whisper_http_url:
         raise RuntimeError("WHISPER_HTTP_URL not configured")
     url = deps.whisper_http_url.rstrip("/")
@@ -106,12 +186,10 @@ async def transcribe_with_http(deps: StreamingDeps, audio_path: str, language: O
         data["language"] = language
 
     timeout = httpx.Timeout(60.0)
-    async with httpx.AsyncClient(timeout=timeout) as client:
-        with open(audio_path, "rb") as handle:
-            files = {"file": ("audio.wav", handle, "audio/wav")}
-            resp = await client.post(url, headers=headers, data=data, files=files)
+    files = {"file": ("audio.wav", wav_bytes, "audio/wav")}
+    resp = await deps.http.post(url, headers=headers, data=data, files=files, timeout=timeout)
     resp.raise_for_status()
-    payload = resp.json()
+    payload = orjson.loads(resp.content)
     text = payload.get("text") if isinstance(payload, dict) else None
     if not isinstance(text, str):
         raise RuntimeError("Whisper HTTP response missing text")
@@ -126,45 +204,61 @@ async def transcribe_with_whisper_cli(
     if shutil.which(deps.whisper_cmd) is None:
         raise RuntimeError(f"whisper command not found: {deps.whisper_cmd}")
 
-    def _run() -> str:
-        with tempfile.TemporaryDirectory() as tmpdir:
-            args = [
-                deps.whisper_cmd,
-                audio_path,
-                "--model",
-                deps.whisper_model,
-                "--output_format",
-                "json",
-                "--output_dir",
-                tmpdir,
-            ]
-            if language:
-                args.extend(["--language", language])
-            result = subprocess.run(args, check=False, capture_output=True, text=True)
-            if result.returncode != 0:
-                raise RuntimeError(result.stderr.strip() or "whisper command failed")
-            base = os.path.splitext(os.path.basename(audio_path))[0]
-            output_path = os.path.join(tmpdir, f"{base}.json")
-            if not os.path.exists(output_path):
-                raise RuntimeError("whisper output not found")
-            payload = json.loads(open(output_path, "r", encoding="utf-8").read())
-            text = payload.get("text") if isinstance(payload, dict) else None
-            if not isinstance(text, str):
-                raise RuntimeError("whisper output missing text")
-            return text
-
-    return await asyncio.to_thread(_run)
+    with tempfile.TemporaryDirectory() as tmpdir:
+        args = [
+            deps.whisper_cmd,
+            audio_path,
+            "--model",
+            deps.whisper_model,
+            "--output_format",
+            "json",
+            "--output_dir",
+            tmpdir,
+        ]
+        if language:
+            args.extend(["--language", language])
+        # Await the process directly instead of parking a worker thread for the whole run.
+        proc = await asyncio.create_subprocess_exec(
+            *args,
+            stdout=asyncio.subprocess.DEVNULL,
+            stderr=asyncio.subprocess.PIPE,
+        )
+        try:
+            _, stderr = await proc.communicate()
+        except asyncio.CancelledError:
+            proc.kill()
+            await proc.wait()
+            raise
+        if proc.returncode != 0:
+            message = stderr.decode("utf-8", errors="replace").strip()
+            raise RuntimeError(message or "whisper command failed")
+        base = os.path.splitext(os.path.basename(audio_path))[0]
+        output_path = os.path.join(tmpdir, f"{base}.json")
+        if not os.path.exists(output_path):
+            raise RuntimeError("whisper output not found")
+        with open(output_path, "rb") as handle:
+            payload = orjson.loads(handle.read())
+        text = payload.get("text") if isinstance(payload, dict) else None
+        if not isinstance(text, str):
+            raise RuntimeError("whisper output missing text")
+        return text
 
 
 async def transcribe_audio(
-    deps: StreamingDeps, pcm_bytes: bytes, sample_rate: int, channels: int, language: Optional[str]
+    deps: StreamingDeps,
+    pcm_bytes: bytes | memoryview,
+    sample_rate: int,
+    channels: int,
+    language: Optional[str],
 ) -> str:
     if not pcm_bytes:
         return ""
+    if deps.whisper_http_url:
+        # The HTTP path uploads straight from memory; only the CLI needs a file on disk.
+        wav_bytes = build_wav_bytes(pcm_bytes, sample_rate, channels)
+        return await transcribe_with_http(deps, wav_bytes, language)
     wav_path = await write_wav_to_temp(pcm_bytes, sample_rate, channels)
     try:
-        if deps.whisper_http_url:
-            return await transcribe_with_http(deps, wav_path, language)
         return await transcribe_with_whisper_cli(deps, wav_path, language)
     finally:
         try:
@@ -173,49 +267,100 @@ async def transcribe_audio(
             pass
 
 
+ASSISTANT_DELTA_FLUSH_CHARS = 32
+ASSISTANT_DELTA_FLUSH_SECONDS = 0.015
+
+
+async def pump_assistant_deltas(ws: WebSocket, deltas: asyncio.Queue) -> None:
+    # Coalesce tiny LLM deltas into one event per size/time window; None ends the stream.
+    loop = asyncio.get_running_loop()
+    finished = False
+    while not finished:
+        delta = await deltas.get()
+        if delta is None:
+            return
+        batch = [delta]
+        size = len(delta)
+        deadline = loop.time() + ASSISTANT_DELTA_FLUSH_SECONDS
+        while size < ASSISTANT_DELTA_FLUSH_CHARS:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                delta = await asyncio.wait_for(deltas.get(), remaining)
+            except asyncio.TimeoutError:
+                break
+            if delta is None:
+                finished = True
+                break
+            batch.append(delta)
+            size += len(delta)
+        await send_ws_event(ws, {"type": "assistant.delta", "text": "".join(batch)})
+
+
 async def stream_openclaw_reply(deps: StreamingDeps, session_key: str, text: str, ws: WebSocket) -> str:
     url = f"{deps.openclaw_base_url}/v1/responses"
     headers = deps.openclaw_headers(session_key)
     body = {"model": deps.openclaw_model, "input": text, "stream": True}
 
-    assistant_text = ""
-    timeout = httpx.Timeout(deps.openclaw_timeout_seconds, read=None)
-    async with httpx.AsyncClient(timeout=timeout) as client:
-        async with client.stream("POST", url, headers=headers, json=body) as resp:
+    parts: list[str] = []
+    deltas: asyncio.Queue = asyncio.Queue()
+    pump = asyncio.create_task(pump_assistant_deltas(ws, deltas))
+    timeout = stream_timeout(deps.openclaw_timeout_seconds)
+    try:
+        async with deps.session.post(url, headers=headers, json=body, timeout=timeout) as resp:
             resp.raise_for_status()
-            async for line in resp.aiter_lines():
-                if not line or not line.startswith("data:"):
-                    continue
-                payload = line.replace("data:", "", 1).strip()
-                if not payload or payload == "[DONE]":
+            async for line in iter_stream_lines(resp.content):
+                if not line.startswith(b"data:"):
                     continue
                 try:
-                    event = json.loads(payload)
-                except json.JSONDecodeError:
+                    event = orjson.loads(memoryview(line)[5:])
+                except orjson.JSONDecodeError:
+                    # Also covers empty payloads and the [DONE] sentinel.
                     continue
                 if event.get("type") == "response.output_text.delta":
                     delta = event.get("delta")
                     if isinstance(delta, str):
-                        assistant_text += delta
-                        await send_ws_event(ws, {"type": "assistant.delta", "text": delta})
+                        parts.append(delta)
+                        deltas.put_nowait(delta)
                 if event.get("type") == "response.output_text.done":
                     done_text = event.get("text")
                     if isinstance(done_text, str):
-                        assistant_text = done_text
+                        parts = [done_text]
+    finally:
+        deltas.put_nowait(None)
+        await pump
+    assistant_text = "".join(parts)
     await send_ws_event(ws, {"type": "assistant.done", "text": assistant_text})
     return assistant_text
 
 
 def pcm_peak_level(pcm_bytes: bytes) -> float:
-    if not pcm_bytes:
+    count = len(pcm_bytes) // 2
+    if not count:
         return 0.0
-    peak = 0
-    for idx in range(0, len(pcm_bytes) - 1, 2):
-        sample = int.from_bytes(pcm_bytes[idx : idx + 2], "little", signed=True)
-        peak = max(peak, abs(sample))
+    samples = np.frombuffer(pcm_bytes, dtype="<i2", count=count)
+    # Compare max and -min instead of abs() so -32768 does not overflow int16.
+    peak = max(int(samples.max()), -int(samples.min()))
     return min(1.0, peak / 32768.0)
 
 
+VISEME_RATE_HZ = 30
+
+
+def pcm_window_peaks(pcm_bytes: bytes, window_samples: int) -> list[float]:
+    # Peak level for each complete window; a trailing partial window is left to the caller.
+    windows = len(pcm_bytes) // (2 * window_samples)
+    if not windows:
+        return []
+    samples = np.frombuffer(pcm_bytes, dtype="<i2", count=windows * window_samples)
+    samples = samples.reshape(windows, window_samples)
+    highs = samples.max(axis=1).astype(np.int32)
+    lows = samples.min(axis=1).astype(np.int32)
+    peaks = np.maximum(highs, -lows)
+    return np.minimum(peaks / 32768.0, 1.0).tolist()
+
+
 def resolve_voice_id(avatar: Any, fallback: str) -> str:
     if avatar is None:
         return fallback
@@ -232,23 +377,12 @@ async def stream_elevenlabs_tts(deps: StreamingDeps, text: str, voice_id: str, w
         return
 
     url = f"{deps.elevenlabs_base_url}/v1/text-to-speech/{voice_id}/stream"
-    params = {}
-    if deps.elevenlabs_optimize_latency:
-        params["optimize_streaming_latency"] = deps.elevenlabs_optimize_latency
-
     payload = {
         "text": text,
         "model_id": deps.elevenlabs_model_id,
         "output_format": deps.elevenlabs_output_format,
     }
 
-    headers = {
-        "xi-api-key": deps.elevenlabs_api_key,
-        "Content-Type": "application/json",
-    }
-    accept = "audio/pcm" if deps.elevenlabs_output_format.startswith("pcm_") else "audio/mpeg"
-    headers["Accept"] = accept
-
     await send_ws_event(
         ws,
         {
@@ -258,29 +392,40 @@ async def stream_elevenlabs_tts(deps: StreamingDeps, text: str, voice_id: str, w
         },
     )
 
-    sample_rate = resolve_pcm_sample_rate(deps.elevenlabs_output_format)
+    sample_rate = deps.tts_sample_rate
     total_samples = 0
+    # Visemes are emitted per fixed window so their rate tracks what a face can render,
+    # not how the upstream happens to chunk the audio.
+    viseme_window = max(1, sample_rate // VISEME_RATE_HZ)
+    viseme_buffer = bytearray()
 
-    timeout = httpx.Timeout(60.0, read=None)
-    async with httpx.AsyncClient(timeout=timeout) as client:
-        async with client.stream("POST", url, params=params, headers=headers, json=payload) as resp:
-            resp.raise_for_status()
-            async for chunk in resp.aiter_bytes():
-                if not chunk:
+    # Audio itself follows as raw binary frames; this describes how to play them.
+    await send_ws_event(
+        ws,
+        {
+            "type": "tts.audio.header",
+            "format": deps.elevenlabs_output_format,
+            "sampleRate": sample_rate,
+        },
+    )
+
+    timeout = stream_timeout(60.0)
+    async with deps.session.post(
+        url, params=deps.tts_params, headers=deps.tts_headers, json=payload, timeout=timeout
+    ) as resp:
+        resp.raise_for_status()
+        async for chunk in resp.content.iter_any():
+            if not chunk:
+                continue
+            await send_ws_bytes(ws, chunk)
+            if deps.tts_is_pcm:
+                viseme_buffer += chunk
+                levels = pcm_window_peaks(viseme_buffer, viseme_window)
+                if not levels:
                     continue
-                encoded = base64.b64encode(chunk).decode("ascii")
-                await send_ws_event(
-                    ws,
-                    {
-                        "type": "tts.audio",
-                        "format": deps.elevenlabs_output_format,
-                        "sampleRate": sample_rate,
-                        "data": encoded,
-                    },
-                )
-                if deps.elevenlabs_output_format.startswith("pcm_"):
-                    total_samples += len(chunk) // 2
-                    level = pcm_peak_level(chunk)
+                del viseme_buffer[: len(levels) * viseme_window * 2]
+                for level in levels:
+                    total_samples += viseme_window
                     await send_ws_event(
                         ws,
                         {
@@ -290,6 +435,17 @@ async def stream_elevenlabs_tts(deps: StreamingDeps, text: str, voice_id: str, w
                         },
                     )
 
+    if len(viseme_buffer) >= 2:
+        total_samples += len(viseme_buffer) // 2
+        await send_ws_event(
+            ws,
+            {
+                "type": "viseme",
+                "value": pcm_peak_level(viseme_buffer),
+                "atMs": int(total_samples / sample_rate * 1000),
+            },
+        )
+
     await send_ws_event(ws, {"type": "tts.done"})
 
 
@@ -304,8 +460,8 @@ def attach_audio_ws(app: FastAPI, deps: StreamingDeps) -> None:
                 message = await ws.receive()
                 if "text" in message and message["text"] is not None:
                     try:
-                        payload = json.loads(message["text"])
-                    except json.JSONDecodeError:
+                        payload = orjson.loads(message["text"])
+                    except orjson.JSONDecodeError:
                         await send_ws_event(ws, {"type": "error", "message": "invalid_json"})
                         continue
 
@@ -346,13 +502,15 @@ def attach_audio_ws(app: FastAPI, deps: StreamingDeps) -> None:
                                 )
 
                             await send_ws_event(ws, {"type": "asr.start"})
-                            transcript = await transcribe_audio(
-                                deps,
-                                bytes(state.buffer),
-                                state.sample_rate,
-                                state.channels,
-                                state.language,
-                            )
+                            # Hand the recording over as a view; the WAV build is its only copy.
+                            with memoryview(state.buffer) as pcm_view:
+                                transcript = await transcribe_audio(
+                                    deps,
+                                    pcm_view,
+                                    state.sample_rate,
+                                    state.channels,
+                                    state.language,
+                                )
                             await send_ws_event(ws, {"type": "asr.final", "text": transcript})
 
                             if transcript:
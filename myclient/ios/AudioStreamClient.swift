@@ -118,7 +118,8 @@ final class AudioStreamClient: ObservableObject {
             guard let data = text.data(using: .utf8) else { return }
             handleJson(data)
         case .data(let data):
-            handleJson(data)
+            // Binary frames carry raw TTS audio; JSON events always arrive as text.
+            playback.enqueuePcm(data)
         @unknown default:
             break
         }
@@ -139,10 +140,6 @@ final class AudioStreamClient: ObservableObject {
             status = "Reply done"
         case "tts.start":
             status = "Speaking"
-        case "tts.audio":
-            guard let base64 = payload["data"] as? String,
-                  let audioData = Data(base64Encoded: base64) else { return }
-            playback.enqueuePcm(audioData)
         case "viseme":
             if let value = payload["value"] as? Double {
                 visemeValue = value